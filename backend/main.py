@@ -1,10 +1,17 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
-from pydantic import BaseModel
-from groq import Groq
+from fastapi.responses import HTMLResponse, ORJSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, field_validator
+from groq import AsyncGroq, DefaultAsyncHttpxClient
+from cachetools import TTLCache
+import asyncio
+import hashlib
+import httpx
+import logging
+import orjson
 import os
 from dotenv import load_dotenv
+from functools import lru_cache
 import re
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -12,7 +19,14 @@ FRONTEND_DIR = os.path.join(BASE_DIR, "frontend")
 
 # Load environment variables
 load_dotenv()
-app = FastAPI(title="AI Code Review Agent")
+
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+)
+logger = logging.getLogger("coderev")
+
+app = FastAPI(title="AI Code Review Agent", default_response_class=ORJSONResponse)
 
 # CORS middleware to allow frontend requests
 app.add_middleware(
@@ -26,15 +40,59 @@ app.add_middleware(
 
 # Initialize Groq client
 api_key = os.getenv("GROQ_API_KEY")
-print(f"✅ GROQ_API_KEY loaded: {bool(api_key)}")
+logger.info("GROQ_API_KEY loaded: %s", bool(api_key))
+
+# One long-lived connection pool so TLS handshakes to Groq are reused across requests
+client = AsyncGroq(
+    api_key=api_key,
+    http_client=DefaultAsyncHttpxClient(
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=50)
+    )
+)
+
+
+# Cache of parsed responses so resubmitting identical code skips the Groq call
+response_cache = TTLCache(maxsize=1024, ttl=3600)
+cache_lock = asyncio.Lock()
+
+
+def make_cache_key(*parts) -> str:
+    """Build a stable cache key from the request fields"""
+    # Encode the fields as a JSON array so no choice of field contents can make two requests collide
+    return hashlib.blake2b(orjson.dumps(parts)).hexdigest()
+
+
+async def cache_get(key: str):
+    async with cache_lock:
+        return response_cache.get(key)
+
+
+async def cache_set(key: str, value) -> None:
+    async with cache_lock:
+        response_cache[key] = value
+
+
+MAX_CODE_BYTES = 32_768
+MAX_REVIEW_BYTES = 32_768
+
+
+def check_size(value: str, name: str, limit: int) -> None:
+    """Reject an oversized field with a short 413 before it reaches Groq"""
+    # Checked in the endpoints rather than a validator, since a 422 would echo the whole input back
+    if len(value.encode("utf-8")) > limit:
+        raise HTTPException(status_code=413, detail=f"{name} too large (max {limit // 1024}KB)")
 
-client = Groq(api_key=api_key)
 
 class CodeReviewRequest(BaseModel):
     code: str
     language: str
     focus_areas: list[str] = ["bugs", "performance", "security", "best_practices"]
 
+    @field_validator("code")
+    @classmethod
+    def strip_code(cls, v: str) -> str:
+        return v.rstrip()
+
 
 class CodeReviewResponse(BaseModel):
     review: str
@@ -48,6 +106,11 @@ class CodeRewriteRequest(BaseModel):
     language: str
     review: str
 
+    @field_validator("code")
+    @classmethod
+    def strip_code(cls, v: str) -> str:
+        return v.rstrip()
+
 
 class CodeRewriteResponse(BaseModel):
     original_code: str
@@ -56,56 +119,50 @@ class CodeRewriteResponse(BaseModel):
     improvements: list[str]
 
 
+# Patterns used to parse LLM responses, compiled once at import time
+_RX_CRITICAL = re.compile(r'### 🔴 Critical Issues.*?(?=###|\Z)', re.DOTALL)
+_RX_HIGH = re.compile(r'### 🟠 High Priority.*?(?=###|\Z)', re.DOTALL)
+_RX_MEDIUM = re.compile(r'### 🟡 Medium Priority.*?(?=###|\Z)', re.DOTALL)
+_RX_LOW = re.compile(r'### 🟢 Low Priority.*?(?=###|\Z)', re.DOTALL)
+_RX_BULLET = re.compile(r'^\s*[-*]\s', re.MULTILINE)
+
+SEVERITY_PATTERNS = [
+    ("critical", _RX_CRITICAL),
+    ("high", _RX_HIGH),
+    ("medium", _RX_MEDIUM),
+    ("low", _RX_LOW),
+]
+
+_RX_SUGGEST_SECTION = re.compile(r'## 🔧 Suggested Improvements.*?(?=##|\Z)', re.DOTALL)
+_RX_SUGGEST_SPLIT = re.compile(r'^\s*\d+\.\s|^\s*[-*]\s', re.MULTILINE)
+
+REWRITE_CODE_MARKER = "## ✨ Rewritten Code"
+_RX_FENCE = re.compile(r'```([\w+-]*)\n(.*?)\n```', re.DOTALL)
+_RX_EXPL = re.compile(r'## 📝 Explanation\n(.*?)(?=##|\Z)', re.DOTALL)
+_RX_IMPR = re.compile(r'## 🎯 Key Improvements\n(.*?)(?=##|\Z)', re.DOTALL)
+
+
 def parse_review_response(review_text: str) -> dict:
     """Parse the LLM response to extract structured data"""
     
-    critical_section = re.search(r'### 🔴 Critical Issues.*?(?=###|\Z)', review_text, re.DOTALL)
-    high_section = re.search(r'### 🟠 High Priority.*?(?=###|\Z)', review_text, re.DOTALL)
-    medium_section = re.search(r'### 🟡 Medium Priority.*?(?=###|\Z)', review_text, re.DOTALL)
-    low_section = re.search(r'### 🟢 Low Priority.*?(?=###|\Z)', review_text, re.DOTALL)
-    
-    critical_count = 0
-    high_count = 0
-    medium_count = 0
-    low_count = 0
-    
-    if critical_section:
-        critical_text = critical_section.group(0)
-        critical_count = len(re.findall(r'^\s*[-*]\s', critical_text, re.MULTILINE))
-        if critical_count == 0:
-            critical_count = len([p for p in critical_text.split('\n') if p.strip() and not p.strip().startswith('#')])
-    
-    if high_section:
-        high_text = high_section.group(0)
-        high_count = len(re.findall(r'^\s*[-*]\s', high_text, re.MULTILINE))
-        if high_count == 0:
-            high_count = len([p for p in high_text.split('\n') if p.strip() and not p.strip().startswith('#')])
-    
-    if medium_section:
-        medium_text = medium_section.group(0)
-        medium_count = len(re.findall(r'^\s*[-*]\s', medium_text, re.MULTILINE))
-        if medium_count == 0:
-            medium_count = len([p for p in medium_text.split('\n') if p.strip() and not p.strip().startswith('#')])
-    
-    if low_section:
-        low_text = low_section.group(0)
-        low_count = len(re.findall(r'^\s*[-*]\s', low_text, re.MULTILINE))
-        if low_count == 0:
-            low_count = len([p for p in low_text.split('\n') if p.strip() and not p.strip().startswith('#')])
-    
-    severity_breakdown = {
-        "critical": max(critical_count, 1) if critical_section else 0,
-        "high": max(high_count, 1) if high_section else 0,
-        "medium": max(medium_count, 1) if medium_section else 0,
-        "low": max(low_count, 1) if low_section else 0
-    }
+    severity_breakdown = {}
+    for key, pattern in SEVERITY_PATTERNS:
+        section = pattern.search(review_text)
+        if not section:
+            severity_breakdown[key] = 0
+            continue
+        section_text = section.group(0)
+        count = len(_RX_BULLET.findall(section_text))
+        if count == 0:
+            count = sum(1 for line in section_text.split('\n') if line.strip() and not line.strip().startswith('#'))
+        severity_breakdown[key] = max(count, 1)
     
     suggestions = []
-    suggestion_section = re.search(r'## 🔧 Suggested Improvements.*?(?=##|\Z)', review_text, re.DOTALL)
+    suggestion_section = _RX_SUGGEST_SECTION.search(review_text)
     
     if suggestion_section:
         suggestion_text = suggestion_section.group(0)
-        suggestion_items = re.split(r'^\s*\d+\.\s|^\s*[-*]\s', suggestion_text, flags=re.MULTILINE)
+        suggestion_items = _RX_SUGGEST_SPLIT.split(suggestion_text)
         
         for item in suggestion_items[1:]:
             item_clean = item.strip()
@@ -113,7 +170,7 @@ def parse_review_response(review_text: str) -> dict:
                 description = item_clean[:200] + "..." if len(item_clean) > 200 else item_clean
                 suggestions.append({"description": description})
     
-    total_issues = severity_breakdown["critical"] + severity_breakdown["high"] + severity_breakdown["medium"] + severity_breakdown["low"]
+    total_issues = sum(severity_breakdown.values())
     
     return {
         "issues_found": total_issues,
@@ -124,28 +181,88 @@ def parse_review_response(review_text: str) -> dict:
 
 
 
+def parse_rewrite_response(rewrite_text: str) -> dict:
+    """Parse the LLM rewrite response to extract code, explanation and improvements"""
+    
+    # Extract rewritten code: the first block after the section header, otherwise the largest block
+    rewritten_code = None
+    
+    marker = rewrite_text.find(REWRITE_CODE_MARKER)
+    if marker >= 0:
+        code_match = _RX_FENCE.search(rewrite_text, marker)
+        if code_match:
+            rewritten_code = code_match.group(2).strip()
+            logger.debug("Extracted code after section header")
+    
+    if not rewritten_code:
+        all_code_blocks = [code for _, code in _RX_FENCE.findall(rewrite_text)]
+        if all_code_blocks:
+            rewritten_code = max(all_code_blocks, key=len).strip()
+            logger.debug("Extracted code using largest block")
+    
+    # Fallback
+    if not rewritten_code:
+        rewritten_code = "# Could not extract rewritten code. Here's the full response:\n\n" + rewrite_text
+        logger.debug("Using fallback - could not extract code")
+    
+    logger.debug("Final code length: %d chars", len(rewritten_code))
+    
+    # Extract explanation
+    explanation_match = _RX_EXPL.search(rewrite_text)
+    explanation = explanation_match.group(1).strip() if explanation_match else "Code has been rewritten with improvements."
+    
+    # Extract improvements
+    improvements = []
+    improvements_match = _RX_IMPR.search(rewrite_text)
+    if improvements_match:
+        improvement_items = (line.lstrip() for line in improvements_match.group(1).splitlines())
+        improvements = [item[2:].strip() for item in improvement_items if item.startswith('- ') and item[2:].strip()][:5]
+    
+    if not improvements:
+        improvements = ["Code refactored for better quality", "Error handling improved", "Performance optimized", "Best practices applied"]
+    
+    return {
+        "rewritten_code": rewritten_code,
+        "explanation": explanation,
+        "improvements": improvements
+    }
+
+
+
+
 # ==================== LOGIN ROUTES (NEW) ====================
 
 
+PAGE_HEADERS = {"Cache-Control": "public, max-age=3600"}
+
+
+@lru_cache(maxsize=None)
+def load_page(filename: str) -> str:
+    """Read a frontend page once and keep it in memory"""
+    # A missing file raises, and lru_cache does not memoize exceptions, so it is retried next time
+    with open(os.path.join(FRONTEND_DIR, filename), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def serve_page(filename: str) -> HTMLResponse:
+    """Serve a cached frontend page, or an uncached error page if it is missing"""
+    try:
+        return HTMLResponse(content=load_page(filename), headers=PAGE_HEADERS)
+    except FileNotFoundError:
+        return HTMLResponse(content=f"<h1>❌ {filename} not found</h1>")
+
+
 @app.get("/", response_class=HTMLResponse)
 async def serve_login():
     """Serve login page"""
-    try:
-        with open(os.path.join(FRONTEND_DIR, "login.html"), "r", encoding="utf-8") as f:
-            return HTMLResponse(content=f.read())
-    except FileNotFoundError:
-        return HTMLResponse(content="<h1>❌ login.html not found</h1>")
+    return serve_page("login.html")
 
 
 
 @app.get("/app", response_class=HTMLResponse)
 async def serve_tool():
     """Serve the tool page after login"""
-    try:
-        with open(os.path.join(FRONTEND_DIR, "index.html"), "r", encoding="utf-8") as f:
-            return HTMLResponse(content=f.read())
-    except FileNotFoundError:
-        return HTMLResponse(content="<h1>❌ index.html not found</h1>")
+    return serve_page("index.html")
 
 
 # ============================================================
@@ -153,23 +270,7 @@ async def serve_tool():
 
 
 
-@app.post("/api/review", response_model=CodeReviewResponse)
-async def review_code(request: CodeReviewRequest):
-    """Review code and provide suggestions using Groq API"""
-    if not request.code.strip():
-        raise HTTPException(status_code=400, detail="Code cannot be empty")
-    
-    focus_str = ", ".join(request.focus_areas)
-    
-    # Properly format the prompt with the code - FIX: Include the actual code with triple backticks
-    prompt = f"""You are an expert code reviewer with 15+ years of experience. Analyze this {request.language} code and provide a detailed review.
-
-Focus on: {focus_str}
-
-Code to review:
-```{request.language}
-{request.code}
-```
+REVIEW_SYSTEM_PROMPT = """You are a senior software engineer specialized in code review with 15+ years of experience. Provide detailed, actionable feedback. Always use bullet points (-) for each issue in the severity sections. You MUST analyze the provided code, concentrating on the listed focus areas.
 
 Provide your review in this format:
 
@@ -205,82 +306,25 @@ Provide your review in this format:
 Be specific, cite line numbers when relevant, and provide code snippets for fixes."""
 
 
+REVIEW_SYSTEM_MSG = {"role": "system", "content": REVIEW_SYSTEM_PROMPT}
 
-    try:
-        print(f"\n{'='*60}")
-        print(f"📝 CODE REVIEW REQUEST")
-        print(f"{'='*60}")
-        print(f"Language: {request.language}")
-        print(f"Code length: {len(request.code)} chars")
-        print(f"Code preview: {request.code[:100]}...")
-        print(f"Focus areas: {focus_str}")
-        print(f"Calling Groq API...")
-        
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a senior software engineer specialized in code review. Provide detailed, actionable feedback. Always use bullet points (-) for each issue in the severity sections. You MUST analyze the provided code."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            model="llama-3.3-70b-versatile",
-            temperature=0.3,
-            max_tokens=2000,
-            top_p=0.9
-        )
-        
-        review_text = chat_completion.choices[0].message.content
-        print(f"✅ Review generated successfully!")
-        print(f"Review length: {len(review_text)} chars")
-        print(f"{'='*60}\n")
-        
-        parsed_data = parse_review_response(review_text)
-        
-        return CodeReviewResponse(
-            review=review_text,
-            issues_found=parsed_data["issues_found"],
-            severity_breakdown=parsed_data["severity_breakdown"],
-            suggestions=parsed_data["suggestions"]
-        )
-        
-    except Exception as e:
-        print(f"\n❌ ERROR in review_code:")
-        print(f"Error type: {type(e).__name__}")
-        print(f"Error message: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        print(f"{'='*60}\n")
-        raise HTTPException(status_code=500, detail=f"Error during code review: {str(e)}")
-
-
-
-
-
-@app.post("/api/rewrite", response_model=CodeRewriteResponse)
-async def rewrite_code(request: CodeRewriteRequest):
-    """Rewrite code to fix issues and improve quality"""
-    if not request.code.strip():
-        raise HTTPException(status_code=400, detail="Code cannot be empty")
-    
-    # FIX: Include the actual code with triple backticks
-    prompt = f"""You are an expert {request.language} developer. Rewrite this code to fix all issues, improve performance, security, and follow best practices.
-
-Original Code:
-```{request.language}
-{request.code}
-```
+# Static instructions come first and the request-specific fields last, so the
+# prompt prefix is identical across requests and provider prompt caching can hit
+REVIEW_TEMPLATE = """Review the code below and follow the required format exactly.
+---
+LANGUAGE: {language}
+FOCUS: {focus}
+CODE:
+```{language}
+{code}
+```"""
 
-Previous Review:
-{request.review}
+REWRITE_SYSTEM_PROMPT = """You are an expert software developer. Rewrite code to be production-ready, fixing all issues, improving performance, security, and maintainability. Always wrap the rewritten code in triple backticks with the language identifier.
 
 Provide your response in this exact format:
 
 ## ✨ Rewritten Code
-```{request.language}
+```<language>
 [Your rewritten code here]
 ```
 
@@ -295,136 +339,440 @@ Provide your response in this exact format:
 
 Make sure the rewritten code is production-ready, well-commented, and addresses all the issues mentioned in the review."""
 
+REWRITE_SYSTEM_MSG = {"role": "system", "content": REWRITE_SYSTEM_PROMPT}
+
+REWRITE_TEMPLATE = """Rewrite the code below using the previous review and follow the required format exactly.
+---
+LANGUAGE: {language}
+PREVIOUS REVIEW:
+{review}
+CODE:
+```{language}
+{code}
+```"""
+
+
+def build_review_messages(request: CodeReviewRequest) -> list[dict]:
+    """Build the chat messages for a code review"""
+    prompt = REVIEW_TEMPLATE.format(
+        language=request.language,
+        focus=", ".join(sorted(request.focus_areas)),
+        code=request.code
+    )
+    return [REVIEW_SYSTEM_MSG, {"role": "user", "content": prompt}]
+
+
+def build_rewrite_messages(request: CodeRewriteRequest) -> list[dict]:
+    """Build the chat messages for a code rewrite"""
+    prompt = REWRITE_TEMPLATE.format(language=request.language, review=request.review, code=request.code)
+    return [REWRITE_SYSTEM_MSG, {"role": "user", "content": prompt}]
+
+
+async def create_review_completion(request: CodeReviewRequest, stream: bool = False):
+    """Call Groq for a code review"""
+    return await client.chat.completions.create(
+        messages=build_review_messages(request),
+        model="llama-3.3-70b-versatile",
+        temperature=0.3,
+        max_tokens=2000,
+        top_p=0.9,
+        stream=stream
+    )
+
+
+async def create_rewrite_completion(request: CodeRewriteRequest, stream: bool = False):
+    """Call Groq for a code rewrite"""
+    return await client.chat.completions.create(
+        messages=build_rewrite_messages(request),
+        model="llama-3.3-70b-versatile",
+        temperature=0.2,
+        max_tokens=2000,
+        top_p=0.9,
+        stream=stream
+    )
+
+
+# Concurrent /api/review calls arriving within a short window can be grouped into one Groq request.
+# Off by default: every caller waits for the whole batch to decode, different users' code shares
+# one prompt, and the batcher needs a long-lived event loop (not per-invocation serverless hosts).
+REVIEW_BATCHING = os.getenv("REVIEW_BATCHING", "").lower() in ("1", "true", "yes")
+REVIEW_BATCH_MAX = 8
+REVIEW_BATCH_WINDOW = 0.05
+REVIEW_BATCH_MAX_CODE = 4000  # larger snippets are reviewed on their own
+REVIEW_BATCH_TIMEOUT = 120
+
+_RX_BATCH_REVIEW = re.compile(r'^## REVIEW (\d+)\s*$', re.MULTILINE)
+
+BATCH_REVIEW_HEADER = """Review each of the {count} snippets below independently and follow the required format exactly for each one.
+Start the review of snippet N with a line containing only "## REVIEW N" and write nothing outside those sections.
+"""
+
+BATCH_SNIPPET_TEMPLATE = """---
+### SNIPPET {index}
+LANGUAGE: {language}
+FOCUS: {focus}
+CODE:
+```{language}
+{code}
+```"""
+
+
+def build_batch_review_messages(requests: list[CodeReviewRequest]) -> list[dict]:
+    """Build the chat messages for reviewing several snippets in one completion"""
+    snippets = [
+        BATCH_SNIPPET_TEMPLATE.format(
+            index=i,
+            language=request.language,
+            focus=", ".join(sorted(request.focus_areas)),
+            code=request.code
+        )
+        for i, request in enumerate(requests, start=1)
+    ]
+    prompt = BATCH_REVIEW_HEADER.format(count=len(requests)) + "\n".join(snippets)
+    return [REVIEW_SYSTEM_MSG, {"role": "user", "content": prompt}]
 
 
-    try:
-        print(f"\n{'='*60}")
-        print(f"🔧 CODE REWRITE REQUEST")
-        print(f"{'='*60}")
-        print(f"Language: {request.language}")
-        print(f"Calling Groq API for rewrite...")
-        
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are an expert software developer. Rewrite code to be production-ready, fixing all issues, improving performance, security, and maintainability. Always wrap the rewritten code in triple backticks with the language identifier."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            model="llama-3.3-70b-versatile",
-            temperature=0.2,
-            max_tokens=2000,
-            top_p=0.9
-        )
-        
-        rewrite_text = chat_completion.choices[0].message.content
-        print(f"✅ Rewrite generated successfully!")
-        print(f"Response length: {len(rewrite_text)} chars")
+def split_batch_reviews(text: str) -> dict[int, str]:
+    """Split a batched completion into reviews keyed by snippet number"""
+    markers = list(_RX_BATCH_REVIEW.finditer(text))
+    reviews = {}
+    for marker, next_marker in zip(markers, markers[1:] + [None]):
+        end = next_marker.start() if next_marker else len(text)
+        reviews[int(marker.group(1))] = text[marker.end():end].strip()
+    return reviews
+
+
+class ReviewBatcher:
+    """Collects pending review requests and sends them to Groq in batches"""
+    
+    def __init__(self):
+        # One queue and collector task per event loop, since both are bound to the loop that created them
+        self.lanes = {}
+        self.tasks = set()
+    
+    def get_queue(self) -> asyncio.Queue:
+        """Return the queue for the running loop, starting its collector if needed"""
+        loop = asyncio.get_running_loop()
+        for stale in [lane_loop for lane_loop in self.lanes if lane_loop.is_closed()]:
+            del self.lanes[stale]
         
-        # Extract rewritten code - try multiple patterns
-        rewritten_code = None
+        lane = self.lanes.get(loop)
+        if lane is None or lane[1].done():
+            queue = asyncio.Queue()
+            lane = (queue, loop.create_task(self.collect(queue)))
+            self.lanes[loop] = lane
+        return lane[0]
+    
+    def spawn(self, coro):
+        """Start a task and keep a reference to it until it finishes"""
+        task = asyncio.create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+    
+    async def submit(self, request: CodeReviewRequest) -> str:
+        """Queue a review and wait for its text"""
+        queue = self.get_queue()
+        future = asyncio.get_running_loop().create_future()
+        await queue.put((request, future))
+        return await asyncio.wait_for(future, REVIEW_BATCH_TIMEOUT)
+    
+    async def collect(self, queue: asyncio.Queue):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + REVIEW_BATCH_WINDOW
+            while len(batch) < REVIEW_BATCH_MAX:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            self.spawn(self.dispatch(batch))
+    
+    async def dispatch(self, batch: list):
+        # Callers that timed out have cancelled futures; skip them
+        batch = [(request, future) for request, future in batch if not future.done()]
+        if not batch:
+            return
+        try:
+            if len(batch) == 1:
+                request, future = batch[0]
+                chat_completion = await create_review_completion(request)
+                if not future.done():
+                    future.set_result(chat_completion.choices[0].message.content)
+                return
+            
+            logger.info("Reviewing %d snippets in one Groq call", len(batch))
+            chat_completion = await client.chat.completions.create(
+                messages=build_batch_review_messages([request for request, _ in batch]),
+                model="llama-3.3-70b-versatile",
+                temperature=0.3,
+                max_tokens=2000 * len(batch),
+                top_p=0.9
+            )
+            reviews = split_batch_reviews(chat_completion.choices[0].message.content)
+            
+            for i, (request, future) in enumerate(batch, start=1):
+                if future.done():
+                    continue
+                if reviews.get(i):
+                    future.set_result(reviews[i])
+                else:
+                    # The model skipped or mangled this section; review it on its own
+                    self.spawn(self.dispatch([(request, future)]))
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+
+review_batcher = ReviewBatcher()
+
+
+def build_review_response(review_text: str) -> CodeReviewResponse:
+    """Turn raw review text into the API response"""
+    parsed_data = parse_review_response(review_text)
+    
+    return CodeReviewResponse(
+        review=review_text,
+        issues_found=parsed_data["issues_found"],
+        severity_breakdown=parsed_data["severity_breakdown"],
+        suggestions=parsed_data["suggestions"]
+    )
+
+
+def build_rewrite_response(original_code: str, rewrite_text: str) -> CodeRewriteResponse:
+    """Turn raw rewrite text into the API response"""
+    parsed_data = parse_rewrite_response(rewrite_text)
+    
+    return CodeRewriteResponse(
+        original_code=original_code,
+        rewritten_code=parsed_data["rewritten_code"],
+        explanation=parsed_data["explanation"],
+        improvements=parsed_data["improvements"]
+    )
+
+
+def sse_event(payload: dict) -> str:
+    """Format a payload as a server-sent event"""
+    return f"data: {orjson.dumps(payload).decode()}\n\n"
+
+
+async def stream_completion(stream, cache_key: str, finalize, label: str):
+    """Relay Groq tokens as SSE deltas, then emit the parsed response as the final event"""
+    chunks = []
+    finish_reason = None
+    try:
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                chunks.append(delta)
+                yield sse_event({"delta": delta})
+            finish_reason = chunk.choices[0].finish_reason or finish_reason
         
-        # Try pattern 1: ```language\n code \n```
-        code_match = re.search(r'```[\w]*\n(.*?)\n```', rewrite_text, re.DOTALL)
-        if code_match:
-            rewritten_code = code_match.group(1).strip()
-            print(f"DEBUG: Extracted code using pattern 1 (language-specific)")
+        text = "".join(chunks)
+        if not text:
+            logger.error("streaming %s returned no content", label.lower())
+            yield sse_event({"error": f"Error during code {label.lower()}: empty response from model"})
+            return
         
-        # Try pattern 2: ``` code ```
-        if not rewritten_code:
-            code_match = re.search(r'```\n(.*?)\n```', rewrite_text, re.DOTALL)
-            if code_match:
-                rewritten_code = code_match.group(1).strip()
-                print(f"DEBUG: Extracted code using pattern 2 (generic)")
+        response = finalize(text)
+        # Truncated output is still returned, but not pinned in the cache for the full TTL
+        if finish_reason != "length":
+            await cache_set(cache_key, response)
+        logger.info("%s streamed len=%d finish=%s", label, len(text), finish_reason)
+        yield sse_event({"done": True, "result": response.model_dump()})
         
-        # Try pattern 3: Look for code between specific markers
-        if not rewritten_code:
-            code_match = re.search(r'## ✨ Rewritten Code\n```[\w]*\n(.*?)\n```', rewrite_text, re.DOTALL)
-            if code_match:
-                rewritten_code = code_match.group(1).strip()
-                print(f"DEBUG: Extracted code using pattern 3 (with header)")
+    except Exception as e:
+        logger.exception("streaming %s failed: %s", label.lower(), e)
+        yield sse_event({"error": f"Error during code {label.lower()}: {e}"})
+
+
+def review_cache_key(request: CodeReviewRequest) -> str:
+    """Cache key for a review request"""
+    return make_cache_key("review", request.language, sorted(request.focus_areas), request.code)
+
+
+def rewrite_cache_key(request: CodeRewriteRequest) -> str:
+    """Cache key for a rewrite request"""
+    return make_cache_key("rewrite", request.language, request.code, request.review)
+
+
+
+
+@app.post("/api/review", response_model=CodeReviewResponse)
+async def review_code(request: CodeReviewRequest):
+    """Review code and provide suggestions using Groq API"""
+    if not request.code:
+        raise HTTPException(status_code=400, detail="Code cannot be empty")
+    check_size(request.code, "Code", MAX_CODE_BYTES)
+    
+    cache_key = review_cache_key(request)
+    cached = await cache_get(cache_key)
+    if cached is not None:
+        logger.info("review served from cache")
+        return cached
+    
+    try:
+        logger.info("review lang=%s len=%d", request.language, len(request.code))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("review focus=%s preview=%r", ", ".join(request.focus_areas), request.code[:100])
         
-        # If still not found, extract the largest code block
-        if not rewritten_code:
-            all_code_blocks = re.findall(r'```[\w]*\n(.*?)\n```', rewrite_text, re.DOTALL)
-            if all_code_blocks:
-                rewritten_code = max(all_code_blocks, key=len).strip()
-                print(f"DEBUG: Extracted code using pattern 4 (largest block)")
+        if REVIEW_BATCHING and len(request.code) <= REVIEW_BATCH_MAX_CODE:
+            review_text = await review_batcher.submit(request)
+        else:
+            chat_completion = await create_review_completion(request)
+            review_text = chat_completion.choices[0].message.content
         
-        # Fallback
-        if not rewritten_code:
-            rewritten_code = "# Could not extract rewritten code. Here's the full response:\n\n" + rewrite_text
-            print(f"DEBUG: Using fallback - could not extract code")
+        logger.info("review generated len=%d", len(review_text))
         
-        print(f"DEBUG: Final code length: {len(rewritten_code)} chars")
-        print(f"{'='*60}\n")
+        response = build_review_response(review_text)
+        await cache_set(cache_key, response)
+        return response
         
-        # Extract explanation
-        explanation_match = re.search(r'## 📝 Explanation\n(.*?)(?=##|\Z)', rewrite_text, re.DOTALL)
-        explanation = explanation_match.group(1).strip() if explanation_match else "Code has been rewritten with improvements."
+    except Exception as e:
+        logger.exception("review_code failed: %s", e)
+        raise HTTPException(status_code=500, detail=f"Error during code review: {e}") from e
+
+
+
+
+@app.post("/api/review/stream")
+async def review_code_stream(request: CodeReviewRequest):
+    """Stream a code review as server-sent events"""
+    if not request.code:
+        raise HTTPException(status_code=400, detail="Code cannot be empty")
+    check_size(request.code, "Code", MAX_CODE_BYTES)
+    
+    cache_key = review_cache_key(request)
+    cached = await cache_get(cache_key)
+    if cached is not None:
+        logger.info("review served from cache")
+        return StreamingResponse(
+            iter([sse_event({"done": True, "result": cached.model_dump()})]),
+            media_type="text/event-stream"
+        )
+    
+    try:
+        logger.info("review stream lang=%s len=%d", request.language, len(request.code))
+        stream = await create_review_completion(request, stream=True)
+    except Exception as e:
+        logger.exception("review_code_stream failed: %s", e)
+        raise HTTPException(status_code=500, detail=f"Error during code review: {e}") from e
+    
+    return StreamingResponse(
+        stream_completion(stream, cache_key, build_review_response, "Review"),
+        media_type="text/event-stream"
+    )
+
+
+
+
+
+@app.post("/api/rewrite", response_model=CodeRewriteResponse)
+async def rewrite_code(request: CodeRewriteRequest):
+    """Rewrite code to fix issues and improve quality"""
+    if not request.code:
+        raise HTTPException(status_code=400, detail="Code cannot be empty")
+    check_size(request.code, "Code", MAX_CODE_BYTES)
+    check_size(request.review, "Review", MAX_REVIEW_BYTES)
+    
+    cache_key = rewrite_cache_key(request)
+    cached = await cache_get(cache_key)
+    if cached is not None:
+        logger.info("rewrite served from cache")
+        return cached
+    
+    try:
+        logger.info("rewrite lang=%s len=%d", request.language, len(request.code))
         
-        # Extract improvements
-        improvements = []
-        improvements_match = re.search(r'## 🎯 Key Improvements\n(.*?)(?=##|\Z)', rewrite_text, re.DOTALL)
-        if improvements_match:
-            improvements_text = improvements_match.group(1)
-            improvement_items = re.findall(r'- (.*?)(?:\n|$)', improvements_text)
-            improvements = [item.strip() for item in improvement_items if item.strip()][:5]
+        chat_completion = await create_rewrite_completion(request)
         
-        if not improvements:
-            improvements = ["Code refactored for better quality", "Error handling improved", "Performance optimized", "Best practices applied"]
+        rewrite_text = chat_completion.choices[0].message.content
+        logger.info("rewrite generated len=%d", len(rewrite_text))
         
-        return CodeRewriteResponse(
-            original_code=request.code,
-            rewritten_code=rewritten_code,
-            explanation=explanation,
-            improvements=improvements
-        )
+        response = build_rewrite_response(request.code, rewrite_text)
+        await cache_set(cache_key, response)
+        return response
         
     except Exception as e:
-        print(f"\n❌ ERROR in rewrite_code:")
-        print(f"Error type: {type(e).__name__}")
-        print(f"Error message: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        print(f"{'='*60}\n")
-        raise HTTPException(status_code=500, detail=f"Error during code rewrite: {str(e)}")
+        logger.exception("rewrite_code failed: %s", e)
+        raise HTTPException(status_code=500, detail=f"Error during code rewrite: {e}") from e
+
+
 
 
 
+@app.post("/api/rewrite/stream")
+async def rewrite_code_stream(request: CodeRewriteRequest):
+    """Stream a code rewrite as server-sent events"""
+    if not request.code:
+        raise HTTPException(status_code=400, detail="Code cannot be empty")
+    check_size(request.code, "Code", MAX_CODE_BYTES)
+    check_size(request.review, "Review", MAX_REVIEW_BYTES)
+    
+    cache_key = rewrite_cache_key(request)
+    cached = await cache_get(cache_key)
+    if cached is not None:
+        logger.info("rewrite served from cache")
+        return StreamingResponse(
+            iter([sse_event({"done": True, "result": cached.model_dump()})]),
+            media_type="text/event-stream"
+        )
+    
+    try:
+        logger.info("rewrite stream lang=%s len=%d", request.language, len(request.code))
+        stream = await create_rewrite_completion(request, stream=True)
+    except Exception as e:
+        logger.exception("rewrite_code_stream failed: %s", e)
+        raise HTTPException(status_code=500, detail=f"Error during code rewrite: {e}") from e
+    
+    return StreamingResponse(
+        stream_completion(stream, cache_key, lambda text: build_rewrite_response(request.code, text), "Rewrite"),
+        media_type="text/event-stream"
+    )
+
+
+
+
+# Static model list, serialized once at import time
+MODELS_JSON = orjson.dumps({
+    "models": [
+        {
+            "id": "llama-3.3-70b-versatile",
+            "name": "Llama 3.3 70B Versatile",
+            "description": "Best for code review & rewrite (Recommended)",
+            "speed": "Very Fast",
+            "recommended": True
+        },
+        {
+            "id": "mixtral-8x7b-32768",
+            "name": "Mixtral 8x7B",
+            "description": "Great for code analysis",
+            "speed": "Very Fast",
+            "recommended": False
+        },
+        {
+            "id": "llama-3.1-8b-instant",
+            "name": "Llama 3.1 8B Instant",
+            "description": "Fastest option",
+            "speed": "Ultra Fast",
+            "recommended": False
+        }
+    ]
+})
+
+MODELS_HEADERS = {"Cache-Control": "public, max-age=300"}
+
 
 @app.get("/api/models")
 async def get_available_models():
     """Get list of available Groq models for code review"""
-    return {
-        "models": [
-            {
-                "id": "llama-3.3-70b-versatile",
-                "name": "Llama 3.3 70B Versatile",
-                "description": "Best for code review & rewrite (Recommended)",
-                "speed": "Very Fast",
-                "recommended": True
-            },
-            {
-                "id": "mixtral-8x7b-32768",
-                "name": "Mixtral 8x7B",
-                "description": "Great for code analysis",
-                "speed": "Very Fast",
-                "recommended": False
-            },
-            {
-                "id": "llama-3.1-8b-instant",
-                "name": "Llama 3.1 8B Instant",
-                "description": "Fastest option",
-                "speed": "Ultra Fast",
-                "recommended": False
-            }
-        ]
-    }
+    return Response(content=MODELS_JSON, media_type="application/json", headers=MODELS_HEADERS)
 
 
 
@@ -445,7 +793,19 @@ if __name__ == "__main__":
     print("✅ Login Page: http://localhost:8000")
     print("✅ Tool Page: http://localhost:8000/app")
     print("="*60 + "\n")
-    uvicorn.run(app, host="127.0.0.1", port=8000)
+    workers = int(os.getenv("WEB_CONCURRENCY", max(2, os.cpu_count() or 1)))
+    uvicorn.run(
+        "main:app",
+        app_dir=os.path.dirname(os.path.abspath(__file__)),
+        host="127.0.0.1",
+        port=8000,
+        workers=workers,
+        backlog=2048,
+        timeout_keep_alive=30,
+        # "auto" picks uvloop and httptools from uvicorn[standard] where they are available
+        loop="auto",
+        http="auto"
+    )
 
 
 